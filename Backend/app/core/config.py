@@ -4,6 +4,7 @@ from pydantic import Field
 from dotenv import load_dotenv
 import os
 from pathlib import Path
+from typing import Optional
 
 env_path = Path(__file__).parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path, override=True)
@@ -22,6 +23,38 @@ class Settings(BaseSettings):
     LLM_MODEL_NAME: str = Field("gpt-4o-mini", env="LLM_MODEL_NAME")
     LLM_TEMPERATURE: float = Field(0.0, env="LLM_TEMPERATURE")
 
+    # Region classifier settings
+    # "llm", "local" or "tiered" (local model first, LLM for low-confidence regions)
+    CLASSIFIER_BACKEND: str = Field("llm", env="CLASSIFIER_BACKEND")
+    LOCAL_CLASSIFIER_MODEL_PATH: str = Field(
+        "models/local_classifier.npz", env="LOCAL_CLASSIFIER_MODEL_PATH"
+    )
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = Field(
+        0.8, env="LOCAL_CLASSIFIER_MIN_CONFIDENCE"
+    )
+    # When set, reviewed /api/generate_pdf payloads are saved here as training data
+    TRAINING_CAPTURE_DIR: str = Field("", env="TRAINING_CAPTURE_DIR")
+
+    # Lazy (per-page) tagging settings
+    DOCUMENT_CACHE_MAX_DOCUMENTS: int = Field(32, env="DOCUMENT_CACHE_MAX_DOCUMENTS")
+    DOCUMENT_CACHE_TTL_SECONDS: int = Field(3600, env="DOCUMENT_CACHE_TTL_SECONDS")
+    # how many pages after the requested one are extracted/classified in the background
+    PREFETCH_PAGES: int = Field(2, env="PREFETCH_PAGES")
+
+    # Output size optimization of generated PDFs: none, fast, balanced or max
+    # (all lossless). Setting PDF_IMAGE_QUALITY (1-100) also recompresses
+    # opaque images as JPEG, which is lossy; unset leaves images untouched.
+    PDF_OPTIMIZATION: str = Field("balanced", env="PDF_OPTIMIZATION")
+    PDF_IMAGE_QUALITY: Optional[int] = Field(None, env="PDF_IMAGE_QUALITY")
+
+    # Request profiling: send "X-Profile: <token>" to /api/ai-tag,
+    # /api/generate_pdf, /api/tag_pdf or /api/ai-tag/documents/... to capture
+    # a profile; empty disables it
+    PROFILING_TOKEN: str = Field("", env="PROFILING_TOKEN")
+    PROFILE_DIR: str = Field("profiles", env="PROFILE_DIR")
+    # oldest profiles beyond this many are deleted
+    PROFILE_MAX_FILES: int = Field(50, env="PROFILE_MAX_FILES")
+
     # class Config:
     #     env_file = env_path
     #     env_file_encoding = "utf-8"
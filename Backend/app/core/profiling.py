@@ -0,0 +1,205 @@
+# app/core/profiling.py
+"""
+Opt-in cProfile capture for a single request.
+
+A `ProfileSession` is bound to the request through a context variable.
+Pipeline code marks its stages with `profile_stage(name, page=...)`; each
+stage gets its own cProfile profile plus wall-clock boundaries, so hot spots
+can be pinned to a stage and page. When no session is active `profile_stage`
+is a no-op. The session is saved as a zip of .prof files (loadable with
+pstats / snakeviz) and a manifest.json.
+
+Worker threads: the context (and so the session) is passed on to the
+per-page extraction worker of the document endpoints, and stages entered
+there are profiled too. On Python <= 3.11 cProfile is per-thread, so such a
+stage gets its own profiler and shows up as its own stages/*.prof. From 3.12
+only one cProfile can be enabled per interpreter and it sees every thread:
+the worker's stage then records timing only, and its calls are counted by
+whichever event-loop profiler is active (they still appear in request.prof).
+
+Other requests that interleave with the profiled one at `await` points show
+up in its profile.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import marshal
+import pstats
+import re
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_current_session: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    "profile_session", default=None
+)
+
+PROFILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class ProfileSession:
+    """Collects per-stage cProfile data and annotations for one request."""
+
+    def __init__(self, label: str):
+        self.profile_id = (
+            datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        )
+        self.label = label
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.annotations: Dict[str, Any] = {}
+        self.stages: List[Dict[str, Any]] = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stage_stats: List[Tuple[str, pstats.Stats]] = []
+        self._root_stats: Optional[pstats.Stats] = None
+        # set when the request is done; background work that inherited the
+        # context (e.g. prefetched pages) is no longer recorded
+        self.closed = False
+        # per-thread stacks of nested stage profilers; only the top one of
+        # each stack is enabled
+        self._stacks: Dict[int, List[cProfile.Profile]] = {}
+
+    # -------------------------------------------------------------- stacks
+    def _push(self, profiler: cProfile.Profile) -> bool:
+        stack = self._stacks.setdefault(threading.get_ident(), [])
+        if stack:
+            stack[-1].disable()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiling tool is already active (on 3.12+ also the
+            # event loop's profiler when called from a worker thread)
+            if stack:
+                stack[-1].enable()
+            return False
+        stack.append(profiler)
+        return True
+
+    def _pop(self, profiler: cProfile.Profile) -> None:
+        stack = self._stacks.get(threading.get_ident(), [])
+        was_top = bool(stack) and stack[-1] is profiler
+        if was_top:
+            profiler.disable()
+        if profiler in stack:
+            stack.remove(profiler)
+        if was_top and stack:
+            stack[-1].enable()
+
+    # ------------------------------------------------------------ lifecycle
+    @contextlib.contextmanager
+    def activate(self) -> Iterator["ProfileSession"]:
+        """Profile everything run in this context until exit."""
+        token = _current_session.set(self)
+        root = cProfile.Profile()
+        enabled = self._push(root)
+        try:
+            yield self
+        finally:
+            if enabled:
+                self._pop(root)
+                self._root_stats = pstats.Stats(root)
+            self.annotations["duration_s"] = round(time.perf_counter() - self._t0, 6)
+            self.closed = True
+            _current_session.reset(token)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **attrs: Any) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        enabled = self._push(profiler)
+        try:
+            yield
+        finally:
+            if enabled:
+                self._pop(profiler)
+            end = time.perf_counter()
+            with self._lock:
+                index = len(self.stages)
+                entry = {
+                    "index": index,
+                    "name": name,
+                    **attrs,
+                    "start_s": round(start - self._t0, 6),
+                    "end_s": round(end - self._t0, 6),
+                    "duration_s": round(end - start, 6),
+                    "thread": threading.current_thread().name,
+                    "profile": None,
+                }
+                if enabled:
+                    suffix = "".join(f"_{k}{v}" for k, v in attrs.items())
+                    entry["profile"] = f"stages/{index:04d}_{name}{suffix}.prof"
+                    self._stage_stats.append((entry["profile"], pstats.Stats(profiler)))
+                self.stages.append(entry)
+
+    # --------------------------------------------------------------- output
+    def save(self, directory: str | Path) -> Path:
+        """Write <directory>/<profile_id>.zip and return its path."""
+        out_dir = Path(directory)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        out_path = out_dir / f"{self.profile_id}.zip"
+        with self._lock:
+            # a stage started before the request ended may still finish
+            stages = list(self.stages)
+            stage_stats = list(self._stage_stats)
+
+        merged: Optional[pstats.Stats] = None
+        with zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for arcname, stats in [("root.prof", self._root_stats), *stage_stats]:
+                if stats is None:
+                    continue
+                zf.writestr(arcname, _dump(stats))
+                if merged is None:
+                    merged = stats
+                else:
+                    merged.add(stats)
+
+            if merged is not None:
+                zf.writestr("request.prof", _dump(merged))
+                summary = io.StringIO()
+                merged.stream = summary
+                merged.sort_stats("cumulative").print_stats(60)
+                zf.writestr("summary.txt", summary.getvalue())
+
+            zf.writestr("manifest.json", json.dumps({
+                "profile_id": self.profile_id,
+                "label": self.label,
+                "started_at": self.started_at,
+                "annotations": self.annotations,
+                "stages": stages,
+            }, indent=2, default=str))
+        return out_path
+
+
+def _dump(stats: pstats.Stats) -> bytes:
+    # same format as Stats.dump_stats, without needing a file path
+    return marshal.dumps(stats.stats)
+
+
+def current_session() -> Optional[ProfileSession]:
+    return _current_session.get()
+
+
+def profile_stage(name: str, **attrs: Any):
+    """
+    Mark a pipeline stage (e.g. profile_stage("extract_page", page=3)).
+    No-op unless the current request is being profiled.
+    """
+    session = _current_session.get()
+    if session is None or session.closed:
+        return contextlib.nullcontext()
+    return session.stage(name, **attrs)
+
+
+def annotate(**values: Any) -> None:
+    """Attach document stats (page count, region count, …) to the active profile."""
+    session = _current_session.get()
+    if session is not None:
+        session.annotations.update(values)
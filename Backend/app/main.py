@@ -4,6 +4,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.ai_tagger import router as ai_router
 from app.routes.pdf_generator import router as pdf_router
+from app.routes.profiling import router as profiling_router, profiling_middleware
 from app.core.logging import init_logging
 from app.core.config import settings
 
@@ -24,8 +25,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
 )
 
+# 2.2) Opt-in per-request profiling (admin token via X-Profile header)
+app.middleware("http")(profiling_middleware)
+
 
 # 3) Mount the AI-Tagger routes under /api
 app.include_router(
@@ -37,6 +42,9 @@ app.include_router(
 # 4) Mount PDF-generator routes
 app.include_router(pdf_router, prefix="/api", tags=["PDF Generator"])
 
+# 5) Mount profile download routes
+app.include_router(profiling_router, prefix="/api", tags=["Profiling"])
+
 # (Optional) You could add a root health check here as well:
 @app.get("/", summary="Root health check")
 async def root():
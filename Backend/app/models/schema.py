@@ -45,3 +45,13 @@ class TagResponse(BaseModel):
     pages: List[PageInfo]
     structure: List[Region]
     metadata: PDFMetadata
+
+class DocumentUploadResponse(BaseModel):
+    document_id: str
+    pages: List[PageInfo]
+    metadata: PDFMetadata
+
+class PageRegionsResponse(BaseModel):
+    document_id: str
+    page: int
+    structure: List[Region]
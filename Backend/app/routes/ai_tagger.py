@@ -1,13 +1,23 @@
 # app/routes/ai_tagger.py
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 from fastapi.responses import JSONResponse
-from starlette.status import HTTP_400_BAD_REQUEST
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_410_GONE
 
 from app.services.extractor import extract_regions, extract_metadata, extract_page_info
-from app.services.classifier import classify_regions
-from app.models.schema import TagResponse, PDFMetadata
+from app.services.classifier import classify_regions, get_backend
+from app.services.document_store import DocumentEvicted, document_store
+from app.models.schema import (
+    TagResponse,
+    PDFMetadata,
+    DocumentUploadResponse,
+    PageRegionsResponse,
+)
+from app.utils.helpers import parse_page_range
 from app.core.config import settings
+from app.core.profiling import annotate, profile_stage
 
 router = APIRouter()
 
@@ -27,7 +37,17 @@ async def ping():
     response_model=TagResponse,
     summary="Upload a PDF and get back AI-suggested accessibility tags + metadata",
 )
-async def ai_tag(file: UploadFile = File(...)):
+async def ai_tag(
+    file: UploadFile = File(...),
+    classifier: Optional[str] = Query(
+        None,
+        description="Classifier backend: llm, local or tiered (defaults to CLASSIFIER_BACKEND).",
+    ),
+    pages: Optional[str] = Query(
+        None,
+        description="1-based pages to tag, e.g. '1-3,5' (defaults to the whole document).",
+    ),
+):
     # 1) Validate input
     if file.content_type != "application/pdf":
         raise HTTPException(
@@ -36,24 +56,125 @@ async def ai_tag(file: UploadFile = File(...)):
     print("pdf recieved ....")
     filename  = file.filename   
     # 2) Read PDF bytes
-    pdf_bytes = await file.read()
+    with profile_stage("read_upload"):
+        pdf_bytes = await file.read()
 
-    # 3) Extract page dimensions
-    pages = extract_page_info(pdf_bytes)
+    # 3) Extract page dimensions, narrowed to the requested page range
+    with profile_stage("page_info"):
+        page_info = extract_page_info(pdf_bytes)
+    page_numbers = None
+    if pages:
+        try:
+            page_numbers = parse_page_range(pages, len(page_info))
+        except ValueError as exc:
+            raise HTTPException(HTTP_400_BAD_REQUEST, detail=str(exc))
+        selected = set(page_numbers)
+        page_info = [p for p in page_info if p["page"] in selected]
 
     # 4) Extract regions (text blocks & images) with spans
-    regions = extract_regions(pdf_bytes)
+    with profile_stage("extract"):
+        regions = extract_regions(pdf_bytes, page_numbers)
+    annotate(
+        filename=filename,
+        pdf_bytes=len(pdf_bytes),
+        pages=len(page_info),
+        regions=len(regions),
+        image_regions=sum(r["type"] in ("image", "checkbox") for r in regions),
+        spans=sum(len(r.get("spans") or []) for r in regions),
+        classifier=classifier or settings.CLASSIFIER_BACKEND,
+    )
 
-    # 5) Classify each region with AI
-    tagged = await classify_regions(regions)
+    # 5) Classify each region with the selected backend
+    try:
+        with profile_stage("classify"):
+            tagged = await classify_regions(regions, backend=classifier, pages=page_info)
+    except ValueError as exc:
+        raise HTTPException(HTTP_400_BAD_REQUEST, detail=str(exc))
 
     # 6) Extract PDF metadata
-    raw_meta = extract_metadata(pdf_bytes, filename)
+    with profile_stage("metadata"):
+        raw_meta = extract_metadata(pdf_bytes, filename)
     meta_obj = PDFMetadata(**raw_meta)
 
     # 7) Return combined JSON
     return JSONResponse(content={
-        "pages": pages,
+        "pages": page_info,
         "structure": tagged,
         "metadata": meta_obj.model_dump()
     })
+
+
+@router.post(
+    "/ai-tag/documents",
+    response_model=DocumentUploadResponse,
+    summary="Upload a PDF for on-demand, per-page tagging",
+)
+async def upload_document(
+    file: UploadFile = File(...),
+    classifier: Optional[str] = Query(
+        None,
+        description="Classifier backend: llm, local or tiered (defaults to CLASSIFIER_BACKEND).",
+    ),
+):
+    """
+    Store the PDF server-side and return its document ID, page list and
+    metadata immediately. Tagged regions are fetched per page from
+    `/ai-tag/documents/{document_id}/pages/{page}`.
+    """
+    if file.content_type != "application/pdf":
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST, detail="Only PDF files are accepted."
+        )
+    try:
+        get_backend(classifier)
+    except ValueError as exc:
+        raise HTTPException(HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    pdf_bytes = await file.read()
+    pages = extract_page_info(pdf_bytes)
+    meta_obj = PDFMetadata(**extract_metadata(pdf_bytes, file.filename))
+
+    doc = document_store.add(
+        pdf_bytes, file.filename, pages, meta_obj.model_dump(), classifier
+    )
+    # start on the first page(s) right away; the reviewer will open them first
+    document_store.prefetch(doc, 1)
+
+    return {
+        "document_id": doc.document_id,
+        "pages": pages,
+        "metadata": doc.metadata,
+    }
+
+
+@router.get(
+    "/ai-tag/documents/{document_id}/pages/{page}",
+    response_model=PageRegionsResponse,
+    summary="Get extracted and AI-tagged regions for a single page",
+)
+async def get_document_page(document_id: str, page: int):
+    doc = document_store.get(document_id)
+    if doc is None:
+        raise HTTPException(HTTP_404_NOT_FOUND, detail="Unknown or expired document.")
+    try:
+        regions = await document_store.get_page_regions(doc, page)
+    except ValueError as exc:
+        raise HTTPException(HTTP_400_BAD_REQUEST, detail=str(exc))
+    except DocumentEvicted:
+        raise HTTPException(HTTP_410_GONE, detail="Document expired while the page was being tagged.")
+
+    return JSONResponse(content={
+        "document_id": document_id,
+        "page": page,
+        "structure": regions,
+    })
+
+
+@router.delete(
+    "/ai-tag/documents/{document_id}",
+    summary="Drop a stored document and its cached results",
+)
+async def delete_document(document_id: str):
+    if not document_store.remove(document_id):
+        raise HTTPException(HTTP_404_NOT_FOUND, detail="Unknown or expired document.")
+    return {"deleted": document_id}
@@ -1,26 +1,148 @@
 # app/routes/pdf_generator.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
 from fastapi.responses import StreamingResponse
 import io
+import json
+import logging
+from typing import Optional
 
+from app.core.config import settings
+from app.core.profiling import annotate
+from app.services.document_store import document_store
 from app.services.generator import generate_pdf_from_json
+from app.services.inplace_tagger import tag_pdf_in_place
+from app.services.local_classifier import save_training_payload
+from app.services.optimizer import OPTIMIZATION_LEVELS, optimize_pdf
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+
+def _capture_training_payload(json_payload: dict) -> None:
+    # Keep the reviewer-corrected tags as training data for the local classifier
+    if settings.TRAINING_CAPTURE_DIR:
+        try:
+            save_training_payload(json_payload, settings.TRAINING_CAPTURE_DIR)
+        except OSError as exc:
+            logger.warning("could not capture training payload: %s", exc)
+
+
+def _annotate_payload(json_payload: dict, mode: str) -> None:
+    # document stats for an active request profile (no-op otherwise)
+    structure = json_payload.get("structure", [])
+    annotate(
+        mode=mode,
+        pages=len(json_payload.get("pages", [])),
+        regions=len(structure),
+        image_regions=sum(r.get("type") in ("image", "checkbox") for r in structure),
+        spans=sum(len(r.get("spans") or []) for r in structure),
+    )
+
+
+def _check_optimize_level(level: Optional[str]) -> None:
+    if level is not None and level not in OPTIMIZATION_LEVELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown optimization level '{level}'; expected one of {', '.join(OPTIMIZATION_LEVELS)}.",
+        )
+
+
+def _optimize(pdf_bytes: bytes, level: str, image_quality: Optional[int]) -> bytes:
+    try:
+        return optimize_pdf(pdf_bytes, level, image_quality or settings.PDF_IMAGE_QUALITY)
+    except Exception as exc:
+        # an un-optimized PDF is still a valid result
+        logger.warning("PDF optimization (%s) failed: %s", level, exc)
+        return pdf_bytes
+
+
+_OPTIMIZE_DESCRIPTION = (
+    "Output size optimization: none, fast, balanced or max. Defaults to "
+    "PDF_OPTIMIZATION for rendered PDFs and to none for in-place tagging "
+    "(which otherwise keeps the original bytes and appends an incremental update). "
+    "All levels are lossless."
+)
+
+_IMAGE_QUALITY_DESCRIPTION = (
+    "Opt in to lossy JPEG recompression of opaque images at this quality (1-100). "
+    "Defaults to PDF_IMAGE_QUALITY; unset keeps images lossless."
+)
+
+
+def _pdf_response(pdf_bytes: bytes) -> StreamingResponse:
+    return StreamingResponse(
+        io.BytesIO(pdf_bytes),
+        media_type="application/pdf",
+        headers={"Content-Disposition": 'attachment; filename="remediated.pdf"'},
+    )
+
+
 @router.post("/generate_pdf", summary="Generate accessible PDF from JSON")
-async def generate_pdf(json_payload: dict):
+async def generate_pdf(
+    json_payload: dict,
+    mode: str = Query(
+        "render",
+        description="'render' rebuilds every page with borb; 'inplace' tags the original "
+                    "PDF stored under the payload's document_id.",
+    ),
+    optimize: Optional[str] = Query(None, description=_OPTIMIZE_DESCRIPTION),
+    image_quality: Optional[int] = Query(None, ge=1, le=100, description=_IMAGE_QUALITY_DESCRIPTION),
+):
     """
     Accept the verified JSON (pages / structure / metadata) and
     return a remediated, tagged PDF.
     """
     print("I work inside generate pdf....")
+    if mode not in ("render", "inplace"):
+        raise HTTPException(status_code=400, detail=f"Unknown generation mode '{mode}'.")
+    _check_optimize_level(optimize)
+    _annotate_payload(json_payload, mode)
+
     try:
-        pdf_bytes = generate_pdf_from_json(json_payload)
+        if mode == "inplace":
+            doc = document_store.get(json_payload.get("document_id", ""))
+            if doc is None:
+                raise ValueError("in-place mode needs the document_id of a stored upload")
+            pdf_bytes = tag_pdf_in_place(doc.pdf_bytes, json_payload)
+        else:
+            pdf_bytes = generate_pdf_from_json(json_payload)
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f"PDF generation failed: {exc}")
 
-    return StreamingResponse(
-        io.BytesIO(pdf_bytes),
-        media_type="application/pdf",
-        headers={"Content-Disposition": 'attachment; filename="remediated.pdf"'},
-    )
+    default_level = settings.PDF_OPTIMIZATION if mode == "render" else "none"
+    pdf_bytes = _optimize(pdf_bytes, optimize or default_level, image_quality)
+
+    _capture_training_payload(json_payload)
+    return _pdf_response(pdf_bytes)
+
+
+@router.post("/tag_pdf", summary="Tag the original PDF in place from JSON")
+async def tag_pdf(
+    file: UploadFile = File(...),
+    payload: str = Form(..., description="The verified JSON (structure / metadata) as a string."),
+    optimize: Optional[str] = Query(None, description=_OPTIMIZE_DESCRIPTION),
+    image_quality: Optional[int] = Query(None, ge=1, le=100, description=_IMAGE_QUALITY_DESCRIPTION),
+):
+    """
+    Write the verified structure, /Lang and metadata into the uploaded
+    original PDF without re-rendering its pages.
+    """
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are accepted.")
+    _check_optimize_level(optimize)
+    try:
+        json_payload = json.loads(payload)
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON payload: {exc}")
+
+    _annotate_payload(json_payload, "inplace")
+    try:
+        pdf_bytes = tag_pdf_in_place(await file.read(), json_payload)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"PDF tagging failed: {exc}")
+
+    pdf_bytes = _optimize(pdf_bytes, optimize or "none", image_quality)
+
+    _capture_training_payload(json_payload)
+    return _pdf_response(pdf_bytes)
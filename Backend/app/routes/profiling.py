@@ -0,0 +1,114 @@
+# app/routes/profiling.py
+
+import hmac
+import logging
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.status import HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND
+
+from app.core.config import settings
+from app.core.profiling import PROFILE_ID_PATTERN, ProfileSession
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Only these endpoints honour the profiling flag
+PROFILED_PATHS = {"/api/ai-tag", "/api/generate_pdf", "/api/tag_pdf"}
+# ... plus the on-demand document endpoints (upload, per-page tagging)
+PROFILED_PREFIXES = ("/api/ai-tag/documents",)
+
+# One profiled request at a time: concurrent profilers on the event-loop
+# thread would clobber each other.
+_profiling_busy = False
+
+
+def is_admin(token: Optional[str]) -> bool:
+    # compare bytes: compare_digest raises TypeError on non-ASCII str
+    return bool(settings.PROFILING_TOKEN) and bool(token) and hmac.compare_digest(
+        token.encode("latin-1", "replace"), settings.PROFILING_TOKEN.encode()
+    )
+
+
+def _prune_profiles(directory: Path, keep: int) -> None:
+    """Delete the oldest saved profiles so at most `keep` remain."""
+    files = sorted(directory.glob("*.zip"), key=lambda f: f.stat().st_mtime)
+    for f in files[: max(len(files) - keep, 0)]:
+        f.unlink(missing_ok=True)
+
+
+async def profiling_middleware(request: Request, call_next):
+    """
+    Profile the request when it carries "X-Profile: <PROFILING_TOKEN>".
+    `?profile` is accepted as a plain flag, but the secret itself is only
+    read from the header so it never ends up in URLs / access logs.
+    The saved profile's ID is returned in the X-Profile-Id response header.
+    """
+    global _profiling_busy
+    token = request.headers.get("x-profile")
+    requested = token is not None or "profile" in request.query_params
+    path = request.url.path
+    if not requested or not (path in PROFILED_PATHS or path.startswith(PROFILED_PREFIXES)):
+        return await call_next(request)
+    if not is_admin(token):
+        return JSONResponse(status_code=HTTP_403_FORBIDDEN, content={"detail": "Profiling not allowed."})
+    if _profiling_busy:
+        response = await call_next(request)
+        response.headers["X-Profile-Skipped"] = "another request is being profiled"
+        return response
+
+    _profiling_busy = True
+    try:
+        session = ProfileSession(label=f"{request.method} {request.url.path}")
+        session.annotations["query"] = {
+            k: v for k, v in request.query_params.items() if k != "profile"
+        }
+        with session.activate():
+            response = await call_next(request)
+        session.annotations["status_code"] = response.status_code
+    finally:
+        _profiling_busy = False
+
+    # the profile is a by-product: never fail the caller's real request over it
+    try:
+        session.save(settings.PROFILE_DIR)
+        _prune_profiles(Path(settings.PROFILE_DIR), settings.PROFILE_MAX_FILES)
+    except Exception as exc:
+        logger.warning("could not save profile %s: %s", session.profile_id, exc)
+        response.headers["X-Profile-Skipped"] = "profile could not be saved"
+        return response
+
+    response.headers["X-Profile-Id"] = session.profile_id
+    return response
+
+
+def _require_admin(x_profile: Optional[str]) -> None:
+    if not is_admin(x_profile):
+        raise HTTPException(HTTP_403_FORBIDDEN, detail="Profiling not allowed.")
+
+
+@router.get("/profiles", summary="List captured request profiles")
+async def list_profiles(x_profile: Optional[str] = Header(None)):
+    _require_admin(x_profile)
+    profile_dir = Path(settings.PROFILE_DIR)
+    files = sorted(profile_dir.glob("*.zip"), reverse=True) if profile_dir.exists() else []
+    return {"profiles": [{"profile_id": f.stem, "bytes": f.stat().st_size} for f in files]}
+
+
+@router.get("/profiles/{profile_id}", summary="Download a captured request profile")
+async def download_profile(
+    profile_id: str,
+    x_profile: Optional[str] = Header(None),
+):
+    """
+    Zip with request.prof (whole request), root.prof, stages/*.prof
+    (one per pipeline stage / page), summary.txt and manifest.json.
+    """
+    _require_admin(x_profile)
+    path = Path(settings.PROFILE_DIR) / f"{profile_id}.zip"
+    if not PROFILE_ID_PATTERN.match(profile_id) or not path.exists():
+        raise HTTPException(HTTP_404_NOT_FOUND, detail="Unknown profile.")
+    return FileResponse(path, media_type="application/zip", filename=path.name)
@@ -1,13 +1,19 @@
 # app/services/classifier.py
 
 import asyncio
-from typing import List, Dict
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional, Tuple
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 from app.core.config import settings
+from app.services.local_classifier import LocalClassifier
+
+logger = logging.getLogger(__name__)
 
 # 1) Build a chat prompt template
 #    We're wrapping the content in a single-user message template.
@@ -47,13 +53,152 @@ async def classify_region(region: Dict) -> str:
     result: str = await _chain.ainvoke({"content": region["content"]})
     return result.strip()
 
-async def classify_regions(regions: List[Dict]) -> List[Dict]:
+
+class ClassifierBackend(ABC):
+    """
+    A strategy for assigning tags to extracted regions.
+    `classify` returns one tag per region, in the same order.
+    """
+    name: str
+
+    @abstractmethod
+    async def classify(
+        self, regions: List[Dict], pages: Optional[List[Dict]] = None
+    ) -> List[str]:
+        ...
+
+
+class LLMClassifierBackend(ClassifierBackend):
+    """The LangChain prompt → LLM pipeline, one call per region."""
+    name = "llm"
+
+    async def classify(
+        self, regions: List[Dict], pages: Optional[List[Dict]] = None
+    ) -> List[str]:
+        return list(await asyncio.gather(*(classify_region(r) for r in regions)))
+
+
+class LocalClassifierBackend(ClassifierBackend):
+    """Batched NumPy inference with a model trained on reviewed payloads."""
+    name = "local"
+
+    def __init__(self, model: LocalClassifier):
+        self.model = model
+
+    async def classify(
+        self, regions: List[Dict], pages: Optional[List[Dict]] = None
+    ) -> List[str]:
+        tags, _ = self.model.predict(regions, pages)
+        return tags
+
+
+class TieredClassifierBackend(ClassifierBackend):
+    """
+    Run the local model first and only send regions whose confidence is
+    below `min_confidence` to the fallback (LLM) backend.
+    """
+    name = "tiered"
+
+    def __init__(
+        self,
+        local: LocalClassifier,
+        fallback: ClassifierBackend,
+        min_confidence: float,
+    ):
+        self.local = local
+        self.fallback = fallback
+        self.min_confidence = min_confidence
+
+    async def classify(
+        self, regions: List[Dict], pages: Optional[List[Dict]] = None
+    ) -> List[str]:
+        tags, confidence = self.local.predict(regions, pages)
+        unsure = [i for i, c in enumerate(confidence) if c < self.min_confidence]
+        if unsure:
+            fallback_tags = await self.fallback.classify([regions[i] for i in unsure], pages)
+            for i, tag in zip(unsure, fallback_tags):
+                tags[i] = tag
+        logger.info(
+            "tiered classifier: %d/%d regions sent to %s",
+            len(unsure), len(regions), self.fallback.name,
+        )
+        return tags
+
+
+BACKEND_NAMES = ("llm", "local", "tiered")
+
+# (modification time of the model file, model loaded from it); None = never checked.
+# A missing or unreadable file is cached too, so it is only retried/logged
+# once per change of the file.
+_local_model_state: Optional[Tuple[Optional[int], Optional[LocalClassifier]]] = None
+
+
+def _load_local_model() -> Optional[LocalClassifier]:
+    """
+    Return the local model from LOCAL_CLASSIFIER_MODEL_PATH, reloading it
+    when the file is replaced (e.g. after retraining).
+    """
+    global _local_model_state
+    path = settings.LOCAL_CLASSIFIER_MODEL_PATH
+    try:
+        mtime: Optional[int] = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    if _local_model_state is not None and _local_model_state[0] == mtime:
+        return _local_model_state[1]
+
+    model: Optional[LocalClassifier] = None
+    if mtime is None:
+        logger.warning("local classifier unavailable: %s not found", path)
+    else:
+        try:
+            model = LocalClassifier.load(path)
+            logger.info("loaded local classifier from %s", path)
+        except (OSError, ValueError) as exc:
+            logger.warning("local classifier unavailable: %s", exc)
+    _local_model_state = (mtime, model)
+    return model
+
+
+def get_backend(name: Optional[str] = None) -> ClassifierBackend:
+    """
+    Resolve a backend by name (defaults to settings.CLASSIFIER_BACKEND).
+    Raises ValueError for unknown names, or for "local" without a trained model.
+    "tiered" degrades to plain LLM classification when no model is available.
+    """
+    name = (name or settings.CLASSIFIER_BACKEND).lower()
+    if name not in BACKEND_NAMES:
+        raise ValueError(
+            f"Unknown classifier backend '{name}'; expected one of {', '.join(BACKEND_NAMES)}."
+        )
+    if name == "llm":
+        return LLMClassifierBackend()
+
+    model = _load_local_model()
+    if name == "local":
+        if model is None:
+            raise ValueError("Local classifier model is not available.")
+        return LocalClassifierBackend(model)
+
+    if model is None:
+        return LLMClassifierBackend()
+    return TieredClassifierBackend(
+        model, LLMClassifierBackend(), settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+    )
+
+
+async def classify_regions(
+    regions: List[Dict],
+    backend: Optional[str] = None,
+    pages: Optional[List[Dict]] = None,
+) -> List[Dict]:
     """
-    Classify a list of regions in parallel via asyncio.gather.
-    Adds a 'tag' field to each region dict and returns the list.
+    Classify a list of regions with the selected backend
+    (see `get_backend`). Adds a 'tag' field to each region dict
+    and returns the list.
     """
-    tasks = [classify_region(r) for r in regions]
-    tags = await asyncio.gather(*tasks)
+    tags = await get_backend(backend).classify(regions, pages)
     for region, tag in zip(regions, tags):
         region["tag"] = tag
-    return regions
\ No newline at end of file
+    return regions
@@ -0,0 +1,183 @@
+# app/services/document_store.py
+"""
+In-memory cache of uploaded PDFs for on-demand, per-page tagging.
+Each page is extracted and classified at most once; requesting a page
+also schedules the next few pages in the background.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.profiling import annotate
+from app.services.classifier import classify_regions
+from app.services.extractor import extract_regions
+
+logger = logging.getLogger(__name__)
+
+# Page extraction runs off the event loop on this single thread, so prefetch
+# queues pages instead of running several PyMuPDF extractions at once.
+# fitz calls made on the event loop (upload page info, /ai-tag, in-place
+# tagging, optimization) are serialized with it through PYMUPDF_LOCK; such a
+# call may block the loop until the page being extracted is finished.
+_extract_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-extract")
+
+
+class DocumentEvicted(LookupError):
+    """The document was evicted or deleted while one of its pages was being tagged."""
+
+
+@dataclass
+class StoredDocument:
+    document_id: str
+    pdf_bytes: bytes
+    filename: str
+    pages: List[Dict]
+    metadata: Dict
+    classifier: Optional[str] = None
+    last_access: float = field(default_factory=time.monotonic)
+    # page number -> task producing that page's tagged regions
+    page_tasks: Dict[int, asyncio.Task] = field(default_factory=dict)
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def cancel_pending(self) -> None:
+        for task in self.page_tasks.values():
+            if not task.done():
+                task.cancel()
+
+
+class DocumentStore:
+    """
+    LRU + TTL bounded map of document_id -> StoredDocument.
+    Must be used from the event loop thread (it schedules asyncio tasks).
+    """
+
+    def __init__(self, max_documents: int, ttl_seconds: int, prefetch_pages: int):
+        self.max_documents = max_documents
+        self.ttl_seconds = ttl_seconds
+        self.prefetch_pages = prefetch_pages
+        self._docs: "OrderedDict[str, StoredDocument]" = OrderedDict()
+
+    def add(
+        self,
+        pdf_bytes: bytes,
+        filename: str,
+        pages: List[Dict],
+        metadata: Dict,
+        classifier: Optional[str] = None,
+    ) -> StoredDocument:
+        self._evict()
+        doc = StoredDocument(
+            document_id=uuid.uuid4().hex,
+            pdf_bytes=pdf_bytes,
+            filename=filename,
+            pages=pages,
+            metadata=metadata,
+            classifier=classifier,
+        )
+        self._docs[doc.document_id] = doc
+        while len(self._docs) > self.max_documents:
+            _, oldest = self._docs.popitem(last=False)
+            oldest.cancel_pending()
+        return doc
+
+    def get(self, document_id: str) -> Optional[StoredDocument]:
+        self._evict()
+        doc = self._docs.get(document_id)
+        if doc is not None:
+            doc.last_access = time.monotonic()
+            self._docs.move_to_end(document_id)
+        return doc
+
+    def remove(self, document_id: str) -> bool:
+        doc = self._docs.pop(document_id, None)
+        if doc is None:
+            return False
+        doc.cancel_pending()
+        return True
+
+    async def get_page_regions(self, doc: StoredDocument, page_no: int) -> List[Dict]:
+        """
+        Return the tagged regions for one page (1-based), computing them
+        on first access and prefetching the following pages.
+        """
+        if not 1 <= page_no <= doc.page_count:
+            raise ValueError(f"Page {page_no} is outside the document (1-{doc.page_count}).")
+
+        existing = doc.page_tasks.get(page_no)
+        # a page scheduled by an earlier request (e.g. prefetch) is only
+        # awaited here, so a profile of this request will not contain its work
+        annotate(
+            page=page_no,
+            page_task="new" if existing is None else "done" if existing.done() else "running",
+        )
+        task = self._schedule(doc, page_no)
+        self.prefetch(doc, page_no + 1)
+        # shield: a client disconnect must not cancel a result other requests share
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                # cancel_pending() ran: LRU/TTL eviction or DELETE
+                raise DocumentEvicted(doc.document_id)
+            raise  # this request itself was cancelled
+
+    def prefetch(self, doc: StoredDocument, start: int, count: Optional[int] = None) -> None:
+        """Start tagging `count` pages (default PREFETCH_PAGES) from `start` in the background."""
+        count = self.prefetch_pages if count is None else count
+        for page_no in range(max(start, 1), min(start + count - 1, doc.page_count) + 1):
+            self._schedule(doc, page_no)
+
+    def _schedule(self, doc: StoredDocument, page_no: int) -> asyncio.Task:
+        task = doc.page_tasks.get(page_no)
+        if task is None:
+            task = asyncio.create_task(self._tag_page(doc, page_no))
+            task.add_done_callback(lambda t, d=doc, p=page_no: self._on_done(d, p, t))
+            doc.page_tasks[page_no] = task
+        return task
+
+    @staticmethod
+    def _on_done(doc: StoredDocument, page_no: int, task: asyncio.Task) -> None:
+        # forget failed/cancelled pages so the next request retries them
+        if task.cancelled() or task.exception() is not None:
+            if doc.page_tasks.get(page_no) is task:
+                del doc.page_tasks[page_no]
+            if not task.cancelled():
+                logger.warning(
+                    "tagging page %d of %s failed: %s", page_no, doc.document_id, task.exception()
+                )
+
+    @staticmethod
+    async def _tag_page(doc: StoredDocument, page_no: int) -> List[Dict]:
+        # extraction is CPU-bound; keep it off the event loop. The context is
+        # copied (as asyncio.to_thread does) so contextvars reach the worker.
+        call = functools.partial(
+            contextvars.copy_context().run, extract_regions, doc.pdf_bytes, [page_no]
+        )
+        regions = await asyncio.get_running_loop().run_in_executor(_extract_executor, call)
+        page_info = [p for p in doc.pages if p["page"] == page_no]
+        return await classify_regions(regions, backend=doc.classifier, pages=page_info)
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for document_id in [d for d, doc in self._docs.items() if doc.last_access < cutoff]:
+            self._docs.pop(document_id).cancel_pending()
+
+
+document_store = DocumentStore(
+    max_documents=settings.DOCUMENT_CACHE_MAX_DOCUMENTS,
+    ttl_seconds=settings.DOCUMENT_CACHE_TTL_SECONDS,
+    prefetch_pages=settings.PREFETCH_PAGES,
+)
@@ -1,10 +1,14 @@
 # app/services/extractor.py
 
 import fitz  # PyMuPDF
-from typing import List, Dict
+from typing import List, Dict, Optional, Iterable
 import base64
-from app.utils.helpers import sort_regions, encode_pixmap_to_base64, normalize_bbox, int_to_rgb
+from app.core.profiling import profile_stage
+from app.utils.helpers import (
+    sort_regions, encode_pixmap_to_base64, normalize_bbox, int_to_rgb, uses_pymupdf,
+)
 
+@uses_pymupdf
 def extract_page_info(pdf_bytes: bytes) -> List[Dict]:
     """Get each page’s width & height."""
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
@@ -20,100 +24,117 @@ def extract_page_info(pdf_bytes: bytes) -> List[Dict]:
     doc.close()
     return pages
 
-def extract_regions(pdf_bytes: bytes) -> List[Dict]:
+def _extract_page(doc: fitz.Document, page_no: int) -> List[Dict]:
+    """Regions (text blocks & images) of a single 1-based page."""
+    page = doc[page_no - 1]
+    regions: List[Dict] = []
+
+    # Text blocks with font & size spans
+    page_dict = page.get_text("dict")
+    for block in page_dict["blocks"]:
+        if block.get("type") != 0:
+            continue
+        bbox = block.get("bbox", [])
+        # rebuild text from block.text or spans
+        raw_text = block.get("text") or "".join(
+            span["text"]
+            for line in block.get("lines", [])
+            for span in line.get("spans", [])
+        )
+        text = raw_text.strip()
+        if not text:
+            continue
+        # Heuristic for label vs normal text
+        region_type = ("form_label" if text.endswith(":") and len(text.split()) <= 3 else "text")
+
+        # Capture spans (font, size, individual bbox) and also captures color
+        spans = []
+
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                # raw color integer
+                color_int = span.get("color", 0)
+                # convert to [r, g, b]
+                rgb = int_to_rgb(color_int)
+                spans.append({
+                    "text": span["text"],
+                    "font": span["font"],
+                    "size": span["size"],
+                    "bbox": span["bbox"],
+                    "color": rgb,     # e.g. [0,0,0] for black
+                })
+
+
+
+        regions.append({
+            "page": page_no,
+            "type": region_type,
+            "bbox": bbox,
+            "content": text,
+            "spans": spans,
+        })
+
+    # # Image regions (with normalize_bbox, preview & raw PNG) (check for small square boxes as potential checkboxes)
+    for img_meta in page.get_images(full=True):
+        xref = img_meta[0]
+        bbox = normalize_bbox(img_meta)
+        width = bbox[2] - bbox[0]
+        height = bbox[3] - bbox[1]
+
+        pix = fitz.Pixmap(doc, xref)
+
+        # 1) Preview URI (small, PNG)
+        data_uri = encode_pixmap_to_base64(pix)
+
+        # 2) Raw PNG bytes (full quality) for future regeneration
+        png_bytes = pix.tobytes("png")
+        raw_b64 = base64.b64encode(png_bytes).decode("utf-8")
+
+        # 3) Pixel dimensions of the image
+        img_w, img_h = pix.width, pix.height
+
+        pix = None  # free memory 
+
+
+
+        # Heuristic: small square = checkbox
+        region_type = (
+            "checkbox" if abs(width - height) < 3 and width < 25 and height < 25 else "image"
+        )
+
+        regions.append({
+            "page": page_no,
+            "type": region_type,
+            "bbox": bbox,
+            "content": data_uri,
+            "xref": xref,
+            "raw_png": raw_b64,
+            "image_width": img_w,
+            "image_height": img_h,
+        })
+
+    return regions
+
+@uses_pymupdf
+def extract_regions(
+    pdf_bytes: bytes, page_numbers: Optional[Iterable[int]] = None
+) -> List[Dict]:
     """
     Parse the PDF into “regions” (text blocks and images),
     each with page number, bbox, type, and content.
     Uses helpers to normalize bbox and encode images.
+    `page_numbers` (1-based) restricts extraction to those pages;
+    by default every page is processed.
     """
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     regions: List[Dict] = []
 
-    for page_no, page in enumerate(doc, start=1):
-        # Text blocks with font & size spans
-        page_dict = page.get_text("dict")
-        for block in page_dict["blocks"]:
-            if block.get("type") != 0:
-                continue
-            bbox = block.get("bbox", [])
-            # rebuild text from block.text or spans
-            raw_text = block.get("text") or "".join(
-                span["text"]
-                for line in block.get("lines", [])
-                for span in line.get("spans", [])
-            )
-            text = raw_text.strip()
-            if not text:
-                continue
-            # Heuristic for label vs normal text
-            region_type = ("form_label" if text.endswith(":") and len(text.split()) <= 3 else "text")
-
-            # Capture spans (font, size, individual bbox) and also captures color
-            spans = []
-
-            for line in block.get("lines", []):
-                for span in line.get("spans", []):
-                    # raw color integer
-                    color_int = span.get("color", 0)
-                    # convert to [r, g, b]
-                    rgb = int_to_rgb(color_int)
-                    spans.append({
-                        "text": span["text"],
-                        "font": span["font"],
-                        "size": span["size"],
-                        "bbox": span["bbox"],
-                        "color": rgb,     # e.g. [0,0,0] for black
-                    })
-
-
-
-            regions.append({
-                "page": page_no,
-                "type": region_type,
-                "bbox": bbox,
-                "content": text,
-                "spans": spans,
-            })
-
-        # # Image regions (with normalize_bbox, preview & raw PNG) (check for small square boxes as potential checkboxes)
-        for img_meta in page.get_images(full=True):
-            xref = img_meta[0]
-            bbox = normalize_bbox(img_meta)
-            width = bbox[2] - bbox[0]
-            height = bbox[3] - bbox[1]
-
-            pix = fitz.Pixmap(doc, xref)
-
-            # 1) Preview URI (small, PNG)
-            data_uri = encode_pixmap_to_base64(pix)
-
-            # 2) Raw PNG bytes (full quality) for future regeneration
-            png_bytes = pix.tobytes("png")
-            raw_b64 = base64.b64encode(png_bytes).decode("utf-8")
-
-            # 3) Pixel dimensions of the image
-            img_w, img_h = pix.width, pix.height
-
-            pix = None  # free memory 
-
-            
-
-            # Heuristic: small square = checkbox
-            region_type = (
-                "checkbox" if abs(width - height) < 3 and width < 25 and height < 25 else "image"
-            )
-
-            regions.append({
-                "page": page_no,
-                "type": region_type,
-                "bbox": bbox,
-                "content": data_uri,
-                "xref": xref,
-                "raw_png": raw_b64,
-                "image_width": img_w,
-                "image_height": img_h,
-            })
+    if page_numbers is None:
+        page_numbers = range(1, doc.page_count + 1)
 
+    for page_no in page_numbers:
+        with profile_stage("extract_page", page=page_no):
+            regions.extend(_extract_page(doc, page_no))
 
     # close the document to release resources
     doc.close()
@@ -121,6 +142,7 @@ def extract_regions(pdf_bytes: bytes) -> List[Dict]:
     # Sort in reading order
     return sort_regions(regions)
 
+@uses_pymupdf
 def extract_metadata(pdf_bytes: bytes, filename: str) -> Dict[str, str]:
     """
     helper function: open the same PDF, read doc.metadata, normalize its keys to snake_case,
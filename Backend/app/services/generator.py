@@ -9,8 +9,9 @@ import base64
 import io
 from decimal import Decimal
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
+from PIL import Image as PILImage
 from borb.pdf import Document, Page, PDF
 from borb.pdf.canvas.geometry.rectangle import Rectangle
 from borb.pdf.canvas.layout.text.paragraph import Paragraph
@@ -21,6 +22,7 @@ from borb.pdf.canvas.color.color import HexColor
 from borb.pdf.canvas.layout.text.heterogeneous_paragraph import (HeterogeneousParagraph)
 
 
+from app.core.profiling import profile_stage
 from app.utils.helpers import (
     float_rgb_to_hex,
     map_tag_to_role,
@@ -64,10 +66,46 @@ def _resolve_font(font_name: str) -> str | TrueTypeFont:
     return "Helvetica"
 
 
+def _merge_spans(span_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge consecutive spans that share font, size and color, so a block
+    becomes as few layout chunks (and font resource uses) as possible.
+    Spans from different lines are joined with a space.
+    """
+    merged: List[Dict[str, Any]] = []
+    for s in span_list:
+        prev = merged[-1] if merged else None
+        if (
+            prev is not None
+            and prev["font"] == s["font"]
+            and prev["size"] == s["size"]
+            and list(prev["color"]) == list(s["color"])
+        ):
+            sep = ""
+            same_line = abs(prev["bbox"][1] - s["bbox"][1]) < 1
+            if not same_line and not prev["text"].endswith(" ") and not s["text"].startswith(" "):
+                sep = " "
+            merged[-1] = {
+                **prev,
+                "text": prev["text"] + sep + s["text"],
+                "bbox": [
+                    min(prev["bbox"][0], s["bbox"][0]),
+                    min(prev["bbox"][1], s["bbox"][1]),
+                    max(prev["bbox"][2], s["bbox"][2]),
+                    max(prev["bbox"][3], s["bbox"][3]),
+                ],
+            }
+        else:
+            merged.append(s)
+    return merged
+
+
 def _build_text_element(span_list: List[Dict[str, Any]]) -> Paragraph:
     """
     Build a Paragraph (plain or multi-styled) from JSON spans.
     """
+    span_list = _merge_spans(span_list)
+
     # For single-span
     if len(span_list) == 1:
         s = span_list[0]
@@ -100,16 +138,26 @@ def _build_text_element(span_list: List[Dict[str, Any]]) -> Paragraph:
 
 
 def _add_image_to_page(
-    page: Page, region: Dict[str, Any], page_height: float
+    page: Page,
+    region: Dict[str, Any],
+    page_height: float,
+    image_cache: Optional[Dict[str, PILImage.Image]] = None,
 ) -> None:
     """
     Decode the base64 PNG and add it as an InlineImage with correct bbox.
+    Identical images (same base64 payload) are decoded once via `image_cache`.
     """
     x, y, w, h = convert_bbox_top_to_bottom(region["bbox"], page_height)
-    img_bytes = base64.b64decode(region["raw_png"])
-    img_stream = io.BytesIO(img_bytes)
+    raw = region["raw_png"]
+    pil_image = image_cache.get(raw) if image_cache is not None else None
+    if pil_image is None:
+        # borb only accepts a path/URL or a PIL image, not a file-like object
+        pil_image = PILImage.open(io.BytesIO(base64.b64decode(raw)))
+        pil_image.load()
+        if image_cache is not None:
+            image_cache[raw] = pil_image
     image = Image(
-        img_stream,  # file-like object or path
+        pil_image,
         width = w,
         height = h,
     )
@@ -117,6 +165,42 @@ def _add_image_to_page(
     image.paint(page, Rectangle(x, y, w, h))
 
 
+def _render_page(
+    doc: Document,
+    page_w: Decimal,
+    page_h: Decimal,
+    regions: List[Dict[str, Any]],
+    image_cache: Dict[str, PILImage.Image],
+) -> None:
+    """Add one page to `doc` and paint its regions."""
+    page = Page(width=page_w, height=page_h)
+    doc.add_page(page)
+
+    # Render every region on this page
+    for region in regions:
+        tag = region.get("tag", "paragraph").lower()
+
+        if region["type"] == "image" or tag == "image":
+            # Handle image (or checkbox if you want separate logic)
+            _add_image_to_page(page, region, float(page_h), image_cache)
+            continue
+
+        # Build paragraph(s) from spans
+        para = _build_text_element(region["spans"])
+        _assign_role(para, map_tag_to_role(tag))
+
+        # Placement rectangle
+        x, y, w, h = convert_bbox_top_to_bottom(region["bbox"], float(page_h))
+
+        # add small safety margin so text always fits
+        h += Decimal(4)          # 4 pt ≈ 1.4 mm
+        # # guarantee enough height
+        # h = max(h, page_h - y)     # stretch down to bottom if needed
+
+
+        para.paint(page, Rectangle(x, y, w, h))
+
+
 def generate_pdf_from_json(data: Dict[str, Any]) -> bytes:
     """
     Main entry: pass the verified JSON, return PDF bytes.
@@ -131,6 +215,8 @@ def generate_pdf_from_json(data: Dict[str, Any]) -> bytes:
     info.keywords = meta.get("keywords", "")
     # Set language if you have it:  info.language = "en-US"
 
+    image_cache: Dict[str, PILImage.Image] = {}
+
     # Group regions by page for easier processing
     regions_by_page: Dict[int, List[Dict[str, Any]]] = {}
     for r in data["structure"]:
@@ -140,39 +226,18 @@ def generate_pdf_from_json(data: Dict[str, Any]) -> bytes:
     for page_def in data["pages"]:
         page_w = Decimal(page_def["width"])
         page_h = Decimal(page_def["height"])
-        page = Page(width=page_w, height=page_h)
-        doc.add_page(page)
-
-        # Render every region on this page
-        for region in regions_by_page.get(page_def["page"], []):
-            tag = region.get("tag", "paragraph").lower()
-
-            if region["type"] == "image" or tag == "image":
-                # Handle image (or checkbox if you want separate logic)
-                _add_image_to_page(page, region, float(page_h))
-                continue
-
-            # Build paragraph(s) from spans
-            para = _build_text_element(region["spans"])
-            _assign_role(para, map_tag_to_role(tag))
-
-            # Placement rectangle
-            x, y, w, h = convert_bbox_top_to_bottom(region["bbox"], float(page_h))
-
-            # add small safety margin so text always fits
-            h += Decimal(4)          # 4 pt ≈ 1.4 mm
-            # # guarantee enough height
-            # h = max(h, page_h - y)     # stretch down to bottom if needed
-
-            
-            para.paint(page, Rectangle(x, y, w, h))
+        with profile_stage("render_page", page=page_def["page"]):
+            _render_page(
+                doc, page_w, page_h, regions_by_page.get(page_def["page"], []), image_cache
+            )
 
     # 3. Serialize to bytes
     pdf_bytes = io.BytesIO()
-    PDF.dumps(pdf_bytes, doc)
+    with profile_stage("serialize"):
+        PDF.dumps(pdf_bytes, doc)
     return pdf_bytes.getvalue()
 
 def _multi_span_paragraph(chunks: List[ChunkOfText]) -> HeterogeneousParagraph:
-    return HeterogeneousParagraph(chunks=chunks)
+    return HeterogeneousParagraph(chunks)
 
 
@@ -0,0 +1,238 @@
+# app/services/inplace_tagger.py
+"""
+Write the reviewed structure into the *original* PDF instead of re-rendering it.
+
+Only new objects are added (structure tree, parent tree, two tiny marked-content
+wrapper streams per page) and the catalog, pages and Info dictionary get new
+keys; existing content streams, fonts and images are left byte-for-byte intact.
+The result is saved incrementally, so the cost scales with the number of tags
+rather than with the amount of page content.
+
+Limitations of not touching content streams: each page's content is one
+marked-content sequence owned by the page's Sect element, so the region
+elements (headings, paragraphs, figures) own no content of their own, and
+running headers/footers are not marked as artifacts; they are read as part
+of the page's Sect.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List
+
+import fitz  # PyMuPDF
+
+from app.core.profiling import profile_stage
+from app.utils.helpers import map_tag_to_role, uses_pymupdf
+
+logger = logging.getLogger(__name__)
+
+# Running headers/footers are artifacts in PDF/UA, so they get no structure
+# element. Their content still sits inside the page's MCID-0 wrapper: marking
+# it /Artifact would need edits to the content streams.
+ARTIFACT_TAGS = {"header", "footer"}
+
+# Roles whose element gets a /T title so heading navigation shows the text
+_TITLED_ROLES = {"Title", "H1", "H2", "H3", "H4", "H5", "H6"}
+
+DEFAULT_LANGUAGE = "en-US"
+
+
+def _new_object(doc: fitz.Document, source: str) -> int:
+    xref = doc.get_new_xref()
+    doc.update_object(xref, source)
+    return xref
+
+
+def _new_stream(doc: fitz.Document, data: bytes) -> int:
+    xref = _new_object(doc, "<<>>")
+    doc.update_stream(xref, data)
+    return xref
+
+
+def _set_dict_entry(doc: fitz.Document, xref: int, key: str, entry: str, value: str) -> None:
+    """
+    Set `entry` inside the dictionary stored under `key` of object `xref`,
+    keeping the dictionary's other entries (it may be inline or indirect).
+    """
+    kind, ref = doc.xref_get_key(xref, key)
+    if kind == "xref":
+        doc.xref_set_key(int(ref.split()[0]), entry, value)
+    else:
+        doc.xref_set_key(xref, f"{key}/{entry}", value)
+
+
+def _page_content_refs(page: fitz.Page) -> str:
+    """
+    Return the page's content streams as the inside of a PDF array
+    ("5 0 R 6 0 R"). get_contents() resolves /Contents given as an indirect
+    array object, which must not be nested inside the new array.
+    """
+    return " ".join(f"{xref} 0 R" for xref in page.get_contents())
+
+
+def _wrap_page_content(doc: fitz.Document, page: fitz.Page, page_index: int) -> None:
+    """
+    Put the page's whole existing content inside one marked-content sequence
+    (MCID 0) by adding a BDC stream before and an EMC stream after it in the
+    /Contents array. The original streams are referenced, not rewritten.
+    """
+    refs = _page_content_refs(page)
+    begin = _new_stream(doc, b"/Sect <</MCID 0>> BDC\n")
+    end = _new_stream(doc, b"\nEMC\n")
+    doc.xref_set_key(page.xref, "Contents", f"[{begin} 0 R {refs} {end} 0 R]")
+    doc.xref_set_key(page.xref, "StructParents", str(page_index))
+    doc.xref_set_key(page.xref, "Tabs", "/S")
+
+
+def _region_element(
+    doc: fitz.Document,
+    region: Dict[str, Any],
+    parent_xref: int,
+    page: fitz.Page,
+) -> int:
+    tag = region.get("tag", "paragraph").lower()
+    role = map_tag_to_role(tag)
+    # extractor bboxes are unrotated PyMuPDF coordinates (top-left origin,
+    # relative to the CropBox); /BBox is in default user space (bottom-left).
+    # transformation_matrix maps PDF -> MuPDF, so apply its inverse.
+    x0, y0, x1, y1 = fitz.Rect(region["bbox"]) * ~page.transformation_matrix
+    # The element has no /K: it owns no content (see module docstring).
+    # Layout attributes keep the region's position; /T gives headings a
+    # navigable label, /Alt describes figures.
+    parts = [
+        "/Type /StructElem",
+        f"/S /{role}",
+        f"/P {parent_xref} 0 R",
+        f"/Pg {page.xref} 0 R",
+        f"/A <</O /Layout /BBox [{x0:g} {y0:g} {x1:g} {y1:g}]>>",
+    ]
+    if role == "Figure":
+        alt = region.get("alt") or region.get("alt_text")
+        if alt:
+            parts.append(f"/Alt {fitz.get_pdf_str(alt)}")
+    elif role in _TITLED_ROLES and region.get("content"):
+        parts.append(f"/T {fitz.get_pdf_str(region['content'][:200])}")
+    return _new_object(doc, "<<" + " ".join(parts) + ">>")
+
+
+def _is_tagged(doc: fitz.Document) -> bool:
+    """
+    True if the PDF already has a structure tree or structure keys on its
+    pages/annotations (including output of this module). Such input would
+    need a merge into its existing ParentTree, which we do not attempt.
+    """
+    if doc.xref_get_key(doc.pdf_catalog(), "StructTreeRoot")[0] != "null":
+        return True
+    for page in doc:
+        if doc.xref_get_key(page.xref, "StructParents")[0] != "null":
+            return True
+        for annot_xref in page.annot_xrefs():
+            if doc.xref_get_key(annot_xref[0], "StructParent")[0] != "null":
+                return True
+    return False
+
+
+def _write_structure_tree(doc: fitz.Document, data: Dict[str, Any]) -> None:
+    catalog = doc.pdf_catalog()
+
+    regions_by_page: Dict[int, List[Dict[str, Any]]] = {}
+    for r in data.get("structure", []):
+        if r.get("tag", "paragraph").lower() in ARTIFACT_TAGS:
+            continue
+        regions_by_page.setdefault(r["page"], []).append(r)
+
+    root = doc.get_new_xref()
+    document_elem = doc.get_new_xref()
+
+    page_elems: List[int] = []
+    parent_nums: List[str] = []
+    for index, page in enumerate(doc):
+        page_xref = page.xref
+        sect = doc.get_new_xref()
+        kids = ["0"] + [
+            f"{_region_element(doc, region, sect, page)} 0 R"
+            for region in regions_by_page.get(index + 1, [])
+        ]
+        doc.update_object(
+            sect,
+            f"<</Type /StructElem /S /Sect /P {document_elem} 0 R "
+            f"/Pg {page_xref} 0 R /K [{' '.join(kids)}]>>",
+        )
+        _wrap_page_content(doc, page, index)
+        parent_nums.append(f"{index} [{sect} 0 R]")
+        page_elems.append(sect)
+
+    doc.update_object(
+        document_elem,
+        f"<</Type /StructElem /S /Document /P {root} 0 R "
+        f"/K [{' '.join(f'{x} 0 R' for x in page_elems)}]>>",
+    )
+    parent_tree = _new_object(doc, f"<</Nums [{' '.join(parent_nums)}]>>")
+    doc.update_object(
+        root,
+        f"<</Type /StructTreeRoot /K {document_elem} 0 R "
+        f"/ParentTree {parent_tree} 0 R /ParentTreeNextKey {doc.page_count}>>",
+    )
+
+    doc.xref_set_key(catalog, "StructTreeRoot", f"{root} 0 R")
+    _set_dict_entry(doc, catalog, "MarkInfo", "Marked", "true")
+    _set_dict_entry(doc, catalog, "ViewerPreferences", "DisplayDocTitle", "true")
+
+
+def _apply_metadata(doc: fitz.Document, meta: Dict[str, Any]) -> None:
+    # an explicit language from the payload wins; otherwise keep the
+    # original's /Lang and only fall back to the default when it has none
+    catalog = doc.pdf_catalog()
+    lang = meta.get("language") or meta.get("lang")
+    if not lang and doc.xref_get_key(catalog, "Lang")[0] == "null":
+        lang = DEFAULT_LANGUAGE
+    if lang:
+        doc.xref_set_key(catalog, "Lang", fitz.get_pdf_str(lang))
+
+    updated = dict(doc.metadata or {})
+    for key in ("title", "author", "subject", "keywords"):
+        if meta.get(key):
+            updated[key] = meta[key]
+    doc.set_metadata(updated)
+
+
+@uses_pymupdf
+def tag_pdf_in_place(pdf_bytes: bytes, data: Dict[str, Any]) -> bytes:
+    """
+    Main entry: original PDF bytes + verified JSON (structure / metadata)
+    → the same PDF with a structure tree, /Lang and metadata added.
+    """
+    # PyMuPDF can only append an incremental update to a file on disk
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(pdf_bytes)
+
+        doc = fitz.open(path)
+        try:
+            if doc.needs_pass:
+                raise ValueError("Encrypted PDFs cannot be tagged in place.")
+            if _is_tagged(doc):
+                raise ValueError(
+                    "PDF is already tagged; in-place tagging needs an untagged original."
+                )
+            with profile_stage("write_structure"):
+                _write_structure_tree(doc, data)
+                _apply_metadata(doc, data.get("metadata", {}))
+
+            if doc.can_save_incrementally():
+                with profile_stage("save_incremental"):
+                    doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+            else:
+                # damaged xref etc.: MuPDF had to repair it, so write a full copy
+                logger.warning("PDF cannot be saved incrementally; writing a full copy")
+                return doc.tobytes()
+        finally:
+            doc.close()
+
+        with open(path, "rb") as fh:
+            return fh.read()
+    finally:
+        os.remove(path)
@@ -0,0 +1,338 @@
+# app/services/local_classifier.py
+"""
+Small CPU-only region classifier trained on reviewed `/api/generate_pdf`
+payloads. Features come from span font/size statistics, bbox position and
+text length; the model is a multinomial logistic regression evaluated with
+batched NumPy matrix products.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Feature order is part of the saved model; append new features at the end
+# and retrain rather than reordering.
+FEATURE_NAMES = [
+    "is_text",
+    "is_image",
+    "is_form_label",
+    "is_checkbox",
+    "x0",
+    "y0",
+    "x1",
+    "y1",
+    "width",
+    "height",
+    "log_chars",
+    "log_words",
+    "span_count",
+    "size_mean",
+    "size_max",
+    "size_min",
+    "size_rel_page",
+    "line_estimate",
+    "bold_fraction",
+    "italic_fraction",
+    "upper_fraction",
+    "ends_colon",
+    "ends_period",
+    "starts_digit",
+]
+
+_BOLD_MARKERS = ("bold", "black", "heavy", "semibold", "demi")
+_ITALIC_MARKERS = ("italic", "oblique")
+
+
+def _page_sizes(pages: Optional[List[Dict[str, Any]]]) -> Dict[int, Tuple[float, float]]:
+    """Map page number -> (width, height) from a `pages` list."""
+    sizes: Dict[int, Tuple[float, float]] = {}
+    for p in pages or []:
+        sizes[int(p["page"])] = (float(p["width"]) or 1.0, float(p["height"]) or 1.0)
+    return sizes
+
+
+def extract_features(
+    regions: List[Dict[str, Any]],
+    pages: Optional[List[Dict[str, Any]]] = None,
+) -> np.ndarray:
+    """
+    Turn a list of region dicts into an (n_regions, n_features) float32 matrix.
+    Positions are normalized by page size when `pages` is given, otherwise
+    by the largest bbox extent seen in the batch.
+    """
+    n = len(regions)
+    X = np.zeros((n, len(FEATURE_NAMES)), dtype=np.float32)
+    if n == 0:
+        return X
+
+    sizes = _page_sizes(pages)
+    fallback_w = max((float(r["bbox"][2]) for r in regions if r.get("bbox")), default=1.0) or 1.0
+    fallback_h = max((float(r["bbox"][3]) for r in regions if r.get("bbox")), default=1.0) or 1.0
+
+    # Median font size per page, so "bigger than body text" is comparable
+    # across documents with different base sizes. Extraction always yields
+    # whole pages, so this is the same whether the batch is one page, a page
+    # range or the whole document (training).
+    page_font_sizes: Dict[Any, List[float]] = {}
+    for r in regions:
+        for s in r.get("spans") or []:
+            if s.get("text", "").strip():
+                page_font_sizes.setdefault(r.get("page"), []).append(float(s["size"]))
+    page_size = {p: float(np.median(v)) for p, v in page_font_sizes.items()}
+
+    for i, region in enumerate(regions):
+        rtype = region.get("type", "text")
+        page_w, page_h = sizes.get(region.get("page"), (fallback_w, fallback_h))
+        x0, y0, x1, y1 = (float(c) for c in region.get("bbox") or (0, 0, 0, 0))
+
+        spans = [s for s in (region.get("spans") or []) if s.get("text", "").strip()]
+        span_sizes = np.array([float(s["size"]) for s in spans], dtype=np.float32)
+        text = region.get("content", "") if rtype not in ("image", "checkbox") else ""
+        n_chars = sum(len(s["text"]) for s in spans) or 1
+        fonts = [(s.get("font") or "").lower() for s in spans]
+
+        size_mean = float(span_sizes.mean()) if spans else 0.0
+        row = X[i]
+        row[0] = rtype == "text"
+        row[1] = rtype == "image"
+        row[2] = rtype == "form_label"
+        row[3] = rtype == "checkbox"
+        row[4] = x0 / page_w
+        row[5] = y0 / page_h
+        row[6] = x1 / page_w
+        row[7] = y1 / page_h
+        row[8] = (x1 - x0) / page_w
+        row[9] = (y1 - y0) / page_h
+        row[10] = np.log1p(len(text))
+        row[11] = np.log1p(len(text.split()))
+        row[12] = len(spans)
+        row[13] = size_mean
+        row[14] = float(span_sizes.max()) if spans else 0.0
+        row[15] = float(span_sizes.min()) if spans else 0.0
+        row[16] = size_mean / page_size.get(region.get("page"), 1.0) if spans else 0.0
+        row[17] = (y1 - y0) / size_mean if size_mean else 0.0
+        row[18] = sum(
+            len(s["text"]) for s, f in zip(spans, fonts) if any(m in f for m in _BOLD_MARKERS)
+        ) / n_chars
+        row[19] = sum(
+            len(s["text"]) for s, f in zip(spans, fonts) if any(m in f for m in _ITALIC_MARKERS)
+        ) / n_chars
+        letters = [c for c in text if c.isalpha()]
+        row[20] = sum(c.isupper() for c in letters) / len(letters) if letters else 0.0
+        row[21] = text.endswith(":")
+        row[22] = text.endswith(".")
+        row[23] = text[:1].isdigit()
+
+    return X
+
+
+class LocalClassifier:
+    """
+    Multinomial logistic regression over `FEATURE_NAMES`.
+    Holds standardization stats, weights and the class labels it was trained on.
+    """
+
+    def __init__(
+        self,
+        classes: List[str],
+        mean: np.ndarray,
+        std: np.ndarray,
+        weights: np.ndarray,
+        bias: np.ndarray,
+    ) -> None:
+        self.classes = list(classes)
+        self.mean = mean.astype(np.float32)
+        self.std = std.astype(np.float32)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+
+    # ------------------------------------------------------------------ io
+    @classmethod
+    def load(cls, path: str | Path) -> "LocalClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            if list(data["feature_names"]) != FEATURE_NAMES:
+                raise ValueError(
+                    f"{path} was trained with a different feature set; retrain it."
+                )
+            return cls(
+                classes=[str(c) for c in data["classes"]],
+                mean=data["mean"],
+                std=data["std"],
+                weights=data["weights"],
+                bias=data["bias"],
+            )
+
+    def save(self, path: str | Path) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            feature_names=np.array(FEATURE_NAMES),
+            classes=np.array(self.classes),
+            mean=self.mean,
+            std=self.std,
+            weights=self.weights,
+            bias=self.bias,
+        )
+
+    # ----------------------------------------------------------- inference
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        logits = ((X - self.mean) / self.std) @ self.weights + self.bias
+        return _softmax(logits)
+
+    def predict(
+        self,
+        regions: List[Dict[str, Any]],
+        pages: Optional[List[Dict[str, Any]]] = None,
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Return (tags, confidences) for a batch of regions.
+        Image regions are always tagged "image", matching the LLM backend.
+        """
+        if not regions:
+            return [], np.zeros(0, dtype=np.float32)
+        proba = self.predict_proba(extract_features(regions, pages))
+        best = proba.argmax(axis=1)
+        tags = [self.classes[j] for j in best]
+        confidence = proba[np.arange(len(regions)), best]
+        for i, region in enumerate(regions):
+            if region.get("type") == "image":
+                tags[i] = "image"
+                confidence[i] = 1.0
+        return tags, confidence
+
+    # ------------------------------------------------------------ training
+    @classmethod
+    def fit(
+        cls,
+        X: np.ndarray,
+        labels: List[str],
+        epochs: int = 500,
+        learning_rate: float = 0.5,
+        l2: float = 1e-3,
+    ) -> "LocalClassifier":
+        """Full-batch gradient descent on the softmax cross-entropy."""
+        classes = sorted(set(labels))
+        index = {c: j for j, c in enumerate(classes)}
+        y = np.zeros((len(labels), len(classes)), dtype=np.float32)
+        y[np.arange(len(labels)), [index[l] for l in labels]] = 1.0
+
+        mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        std[std < 1e-6] = 1.0
+        Xs = (X - mean) / std
+
+        weights = np.zeros((X.shape[1], len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        n = float(len(labels))
+        for _ in range(epochs):
+            grad = (_softmax(Xs @ weights + bias) - y) / n
+            weights -= learning_rate * (Xs.T @ grad + l2 * weights)
+            bias -= learning_rate * grad.sum(axis=0)
+
+        return cls(classes, mean, std, weights, bias)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+# ---------------------------------------------------------------------------
+# Training data capture
+# ---------------------------------------------------------------------------
+def _document_key(pages: List[Dict[str, Any]], structure: List[Dict[str, Any]]) -> str:
+    """
+    Hash of the document's layout and text, ignoring tags, so every review
+    round of the same document maps to the same capture file.
+    """
+    identity = {
+        "pages": [[p.get("page"), p.get("width"), p.get("height")] for p in pages],
+        "regions": [
+            [r.get("page"), r.get("type"), r.get("bbox"), r.get("content", "")]
+            for r in structure
+        ],
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def save_training_payload(payload: Dict[str, Any], directory: str | Path) -> Path:
+    """
+    Persist a reviewed `/api/generate_pdf` payload for later training.
+    Image bytes are dropped: the model never looks at pixels. Captures of
+    the same document overwrite each other, so regenerating a document
+    does not give it extra weight and the latest review wins.
+    """
+    structure = []
+    for region in payload.get("structure", []):
+        region = dict(region)
+        if region.get("type") in ("image", "checkbox"):
+            region.pop("raw_png", None)
+            region["content"] = ""
+        structure.append(region)
+
+    out_dir = Path(directory)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    pages = payload.get("pages", [])
+    out_path = out_dir / f"{_document_key(pages, structure)}.json"
+    out_path.write_text(
+        json.dumps({"pages": pages, "structure": structure}),
+        encoding="utf-8",
+    )
+    return out_path
+
+
+def load_training_set(paths: Iterable[str | Path]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Read captured payloads (files, or directories of *.json) and return the
+    stacked feature matrix with the reviewed tag of every region.
+    """
+    files: List[Path] = []
+    for p in map(Path, paths):
+        files.extend(sorted(p.glob("*.json")) if p.is_dir() else [p])
+
+    blocks: List[np.ndarray] = []
+    labels: List[str] = []
+    for f in files:
+        payload = json.loads(f.read_text(encoding="utf-8"))
+        regions = [r for r in payload.get("structure", []) if r.get("tag")]
+        if not regions:
+            continue
+        blocks.append(extract_features(regions, payload.get("pages")))
+        labels.extend(r["tag"].strip().lower() for r in regions)
+
+    if not blocks:
+        raise ValueError("No tagged regions found in the given training payloads.")
+    return np.vstack(blocks), labels
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Train the local region classifier from captured generate_pdf payloads."
+    )
+    parser.add_argument("inputs", nargs="+", help="payload .json files or directories")
+    parser.add_argument("-o", "--output", required=True, help="where to write the .npz model")
+    parser.add_argument("--epochs", type=int, default=500)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-3)
+    args = parser.parse_args(argv)
+
+    X, labels = load_training_set(args.inputs)
+    model = LocalClassifier.fit(
+        X, labels, epochs=args.epochs, learning_rate=args.learning_rate, l2=args.l2
+    )
+    model.save(args.output)
+
+    predicted = model.predict_proba(X).argmax(axis=1)
+    accuracy = float(np.mean([model.classes[j] == l for j, l in zip(predicted, labels)]))
+    print(f"trained on {len(labels)} regions, {len(model.classes)} tags, "
+          f"training accuracy {accuracy:.3f} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# app/services/optimizer.py
+"""
+Post-generation size optimization with PyMuPDF.
+
+Levels trade CPU time for output size and are all lossless:
+  - "none":     return the bytes unchanged
+  - "fast":     drop unused objects, deflate streams, object streams + xref stream
+  - "balanced": "fast" + merge duplicate objects (identical images/fonts),
+                subset embedded fonts
+  - "max":      "balanced" with maximum deflate effort
+
+Recompressing opaque images as JPEG is lossy and therefore opt-in: it only
+happens when an `image_quality` is passed (with any level but "none").
+
+Only resources and file layout are rewritten; content streams and the
+structure tree (reachable from the catalog) are kept as they are, so tags
+survive every level.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+from app.core.profiling import profile_stage
+from app.utils.helpers import uses_pymupdf
+
+logger = logging.getLogger(__name__)
+
+OPTIMIZATION_LEVELS = ("none", "fast", "balanced", "max")
+
+# Images smaller than this are not worth a JPEG header + re-encode
+_MIN_RECOMPRESS_PIXELS = 64 * 64
+
+
+def _recompress_images(doc: fitz.Document, quality: int) -> int:
+    """
+    Re-encode opaque RGB/gray images as JPEG at `quality`, keeping the new
+    stream only when it is smaller. Returns the number of images replaced.
+    """
+    images = [xref for xref in range(1, doc.xref_length()) if doc.xref_is_image(xref)]
+    # masks (and images that have one) would need their own handling; a soft
+    # mask is itself a DeviceGray image, so collect them up front
+    masks = set()
+    for xref in images:
+        for key in ("SMask", "Mask"):
+            kind, value = doc.xref_get_key(xref, key)
+            if kind == "xref":
+                masks.add(int(value.split()[0]))
+
+    replaced = 0
+    for xref in images:
+        if xref in masks:
+            continue
+        if doc.xref_get_key(xref, "SMask")[0] != "null" or doc.xref_get_key(xref, "Mask")[0] != "null":
+            continue
+        if doc.xref_get_key(xref, "ImageMask")[1] == "true":
+            continue
+        try:
+            pix = fitz.Pixmap(doc, xref)
+        except (RuntimeError, ValueError):
+            continue
+        if pix.alpha or pix.n not in (1, 3) or pix.width * pix.height < _MIN_RECOMPRESS_PIXELS:
+            continue
+
+        jpeg = pix.tobytes("jpg", jpg_quality=quality)
+        if len(jpeg) >= len(doc.xref_stream_raw(xref)):
+            continue
+
+        doc.update_stream(xref, jpeg, compress=False)
+        doc.xref_set_key(xref, "Filter", "/DCTDecode")
+        doc.xref_set_key(xref, "DecodeParms", "null")
+        doc.xref_set_key(xref, "Decode", "null")
+        doc.xref_set_key(xref, "BitsPerComponent", "8")
+        doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if pix.n == 1 else "/DeviceRGB")
+        doc.xref_set_key(xref, "Width", str(pix.width))
+        doc.xref_set_key(xref, "Height", str(pix.height))
+        replaced += 1
+    return replaced
+
+
+@uses_pymupdf
+def optimize_pdf(
+    pdf_bytes: bytes, level: str = "balanced", image_quality: Optional[int] = None
+) -> bytes:
+    """
+    Main entry: PDF bytes in, (usually) smaller PDF bytes out.
+    `image_quality` (1-100) enables lossy JPEG recompression of images.
+    Falls back to the input if the optimized file is not smaller.
+    """
+    if level not in OPTIMIZATION_LEVELS:
+        raise ValueError(
+            f"Unknown optimization level '{level}'; expected one of {', '.join(OPTIMIZATION_LEVELS)}."
+        )
+    if level == "none":
+        return pdf_bytes
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        if level in ("balanced", "max"):
+            with profile_stage("subset_fonts"):
+                try:
+                    doc.subset_fonts()
+                except Exception as exc:  # fontTools problems must not fail generation
+                    logger.warning("font subsetting skipped: %s", exc)
+
+        if image_quality:
+            with profile_stage("recompress_images"):
+                replaced = _recompress_images(doc, image_quality)
+                logger.info("recompressed %d image(s) at quality %d", replaced, image_quality)
+
+        with profile_stage("write_optimized"):
+            out = doc.tobytes(
+                garbage=3 if level == "fast" else 4,  # 4 also merges duplicate objects
+                deflate=True,
+                deflate_images=True,
+                deflate_fonts=True,
+                use_objstms=1,  # implies a compressed xref stream
+                compression_effort=100 if level == "max" else 0,
+            )
+    finally:
+        doc.close()
+
+    return out if len(out) < len(pdf_bytes) else pdf_bytes
@@ -1,10 +1,25 @@
 # app/utils/helpers.py
 
 import base64
+import functools
+import threading
 from typing import List, Tuple, Dict, Any
 from decimal import Decimal
 from borb.pdf.canvas.color.color import HexColor
 
+# PyMuPDF does not support multithreaded use. Every service entry point that
+# touches fitz takes this lock, so page extraction on the document store's
+# worker thread never overlaps with fitz calls made on the event loop.
+PYMUPDF_LOCK = threading.RLock()
+
+def uses_pymupdf(func):
+    """Decorator: run `func` while holding PYMUPDF_LOCK."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with PYMUPDF_LOCK:
+            return func(*args, **kwargs)
+    return wrapper
+
 def float_rgb_to_hex(rgb_floats: List[float]) -> HexColor:
     """
     JSON stores colors as floats 0-1 → convert to HexColor for borb.
@@ -116,6 +131,33 @@ def sort_regions(regions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     )
 
 
+def parse_page_range(spec: str, page_count: int) -> List[int]:
+    """
+    Parse a 1-based page selection such as "1-3,5,8-" into a sorted list
+    of page numbers. Open-ended ranges ("8-") run to the last page.
+    Raises ValueError for malformed or out-of-range selections.
+    """
+    selected = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start_s, sep, end_s = part.partition("-")
+        try:
+            start = int(start_s) if start_s.strip() else 1
+            end = (int(end_s) if end_s.strip() else page_count) if sep else start
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'.")
+        if start < 1 or end > page_count or start > end:
+            raise ValueError(
+                f"Page range '{part}' is outside the document (1-{page_count})."
+            )
+        selected.update(range(start, end + 1))
+    if not selected:
+        raise ValueError("Page range selects no pages.")
+    return sorted(selected)
+
+
 def encode_pixmap_to_base64(pixmap) -> str:
     """
     Given a PyMuPDF Pixmap, convert to PNG bytes then Base64.